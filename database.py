@@ -5,8 +5,12 @@ MongoDB helper functions ready to use in your backend code.
 Import and use these functions in your API endpoints for database operations.
 """
 
-from pymongo import MongoClient
+import msgspec
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, TEXT, IndexModel
 from datetime import datetime, timezone
+import logging
 import os
 from dotenv import load_dotenv
 from typing import Union
@@ -15,41 +19,127 @@ from pydantic import BaseModel
 # Load environment variables from .env file
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 _client = None
 db = None
 
 database_url = os.getenv("DATABASE_URL")
 database_name = os.getenv("DATABASE_NAME")
 
+# Fail fast when Mongo is unreachable instead of pymongo's 30s default, so
+# callers with a fallback (e.g. the cached sitemap) can use it promptly
+SERVER_SELECTION_TIMEOUT_MS = 2000
+
+# Server-side cap on any read, so a slow Mongo can't pin requests indefinitely
+QUERY_MAX_TIME_MS = 2000
+
 if database_url and database_name:
-    _client = MongoClient(database_url)
+    _client = AsyncIOMotorClient(database_url, serverSelectionTimeoutMS=SERVER_SELECTION_TIMEOUT_MS)
     db = _client[database_name]
 
+# Lowercased copies of these fields are stored as "<field>_lc" so that
+# case-insensitive prefix searches can use a plain (case-sensitive) index.
+# create_document writes them; backfill_lowercase_fields (run at startup via
+# ensure_indexes) fills them in on hand-loaded documents.
+LOWERCASE_FIELDS = {
+    "article": ("title", "summary"),
+}
+
 # Helper functions for common database operations
-def create_document(collection_name: str, data: Union[BaseModel, dict]):
-    """Insert a single document with timestamp"""
+async def create_document(collection_name: str, data: Union[BaseModel, msgspec.Struct, dict], _id: str = None):
+    """Insert a single document with timestamp (optionally with a pre-generated ObjectId)"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
 
-    # Convert Pydantic model to dict if needed
+    # Convert Pydantic model / msgspec struct to dict if needed
     if isinstance(data, BaseModel):
         data_dict = data.model_dump()
+    elif isinstance(data, msgspec.Struct):
+        data_dict = msgspec.structs.asdict(data)
     else:
         data_dict = data.copy()
 
+    for field in LOWERCASE_FIELDS.get(collection_name, ()):
+        value = data_dict.get(field)
+        if isinstance(value, str):
+            data_dict[f"{field}_lc"] = value.lower()
+
+    if _id is not None:
+        data_dict['_id'] = ObjectId(_id)
+
     data_dict['created_at'] = datetime.now(timezone.utc)
     data_dict['updated_at'] = datetime.now(timezone.utc)
 
-    result = db[collection_name].insert_one(data_dict)
+    result = await db[collection_name].insert_one(data_dict)
     return str(result.inserted_id)
 
-def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
-    """Get documents from collection"""
+def iter_documents(collection_name: str, filter_dict: dict = None, limit: int = None,
+                   projection: dict = None, sort: list = None, batch_size: int = None):
+    """Lazily iterate documents from collection (returns the async motor cursor)"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
     
-    cursor = db[collection_name].find(filter_dict or {})
+    cursor = db[collection_name].find(filter_dict if filter_dict is not None else {}, projection).max_time_ms(QUERY_MAX_TIME_MS)
+    if batch_size:
+        cursor = cursor.batch_size(batch_size)
+    if sort:
+        cursor = cursor.sort(sort)
     if limit:
         cursor = cursor.limit(limit)
     
-    return list(cursor)
+    return cursor
+
+async def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None,
+                        projection: dict = None, sort: list = None):
+    """Get documents from collection"""
+    cursor = iter_documents(collection_name, filter_dict, limit, projection, sort)
+    return await cursor.to_list(length=None)
+
+# Indexes the API's queries rely on, per collection
+INDEXES = {
+    "article": [
+        IndexModel([("title", TEXT), ("summary", TEXT)], weights={"title": 10, "summary": 3}, name="article_text"),
+        IndexModel([("title_lc", ASCENDING)]),
+        IndexModel([("summary_lc", ASCENDING)]),
+    ],
+    # /doctors filters; array fields become multikey indexes
+    "doctor": [
+        IndexModel([("specialties", ASCENDING)]),
+        IndexModel([("states", ASCENDING)]),
+        IndexModel([("cities", ASCENDING)]),
+        IndexModel([("pathologies", ASCENDING)]),
+        IndexModel([("consultation_types", ASCENDING)]),
+        IndexModel([("price_from", ASCENDING), ("states", ASCENDING)]),
+    ],
+}
+
+async def backfill_lowercase_fields():
+    """Populate missing "<field>_lc" copies on documents not written through create_document (idempotent)"""
+    if db is None:
+        return
+
+    for collection_name, fields in LOWERCASE_FIELDS.items():
+        try:
+            result = await db[collection_name].update_many(
+                {"$or": [{f"{field}_lc": {"$exists": False}} for field in fields]},
+                [{"$set": {f"{field}_lc": {"$toLower": f"${field}"} for field in fields}}],
+            )
+        except Exception:
+            logger.exception("Could not backfill lowercase fields on %s", collection_name)
+        else:
+            if result.modified_count:
+                logger.info("Backfilled lowercase fields on %d %s documents", result.modified_count, collection_name)
+
+async def ensure_indexes():
+    """Create the indexes in INDEXES (idempotent); each one independently, logging failures"""
+    if db is None:
+        return
+
+    await backfill_lowercase_fields()
+    for collection_name, indexes in INDEXES.items():
+        for index in indexes:
+            try:
+                await db[collection_name].create_indexes([index])
+            except Exception:
+                logger.exception("Could not create index %s on %s", index.document["name"], collection_name)
@@ -1,50 +1,136 @@
+import asyncio
+import hashlib
+import logging
 import os
-from typing import List, Optional
-from fastapi import FastAPI, HTTPException, Query
+import re
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional, TypedDict
+
+import msgspec
+import orjson
+from bson import ObjectId
+from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException, Query, Request
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 from pydantic import BaseModel
+from pymongo.errors import OperationFailure
+
+from database import db, create_document, get_documents, iter_documents, ensure_indexes
+from schemas import (
+    DoctorOut, ArticleCard, ArticleOut, AppointmentRequest, NewsletterSubscriber, SCHEMA_REGISTRY, decode_hook, schema_hook,
+)
+
+logger = logging.getLogger(__name__)
+
+# Resolved once at import (after database.py has loaded .env), not per request
+FRONTEND_URL = os.getenv("FRONTEND_URL", "https://example.com").rstrip("/").encode()
+DATABASE_URL_SET = bool(os.getenv("DATABASE_URL"))
+DATABASE_NAME_ENV = os.getenv("DATABASE_NAME")
+CORS_ORIGINS = [o.strip() for o in os.getenv("CORS_ORIGINS", "https://example.com").split(",") if o.strip()]
+
+
+# -----------------------------
+# JSON rendering
+# -----------------------------
+def _default(obj: Any):
+    """Fallback encoder for Mongo types orjson doesn't know about"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    raise TypeError
+
 
-from database import db, create_document, get_documents
-from schemas import Doctor, Article, AppointmentRequest, NewsletterSubscriber, SCHEMA_REGISTRY
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson, skipping jsonable_encoder for raw Mongo docs"""
 
-app = FastAPI(title="Medicinal Cannabis Portal API", version="0.2.0")
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content,
+            default=_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+        )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build indexes in the background so an unreachable Mongo doesn't delay
+    # startup; ensure_indexes logs any index it fails to create
+    index_task = asyncio.create_task(ensure_indexes())
+    yield
+    index_task.cancel()
+
+
+app = FastAPI(
+    title="Medicinal Cannabis Portal API",
+    version="0.2.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=CORS_ORIGINS,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST"],
+    allow_headers=["content-type", "authorization"],
 )
 
 
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Medicinal Cannabis Portal API is running"}
 
 
+_HEALTHZ_BODY = b'{"ok":true}'
+
+_TEST_STATUS_TTL = 30  # seconds
+_TEST_STATUS_TEMPLATE = {
+    "backend": "✅ Running",
+    "database": "❌ Not Available",
+    "database_url": "❌ Not Set",
+    "database_name": "❌ Not Set",
+    "connection_status": "Not Connected",
+    "collections": [],
+}
+
+# (monotonic timestamp, status) of the last successful check; failures are never cached
+_last_healthy_status = (0.0, None)
+
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness probe: never touches Mongo"""
+    return Response(content=_HEALTHZ_BODY, media_type="application/json")
+
+
 @app.get("/test")
-def test_database():
-    """Check database connectivity and list available collections"""
-    status = {
-        "backend": "✅ Running",
-        "database": "❌ Not Available",
-        "database_url": "❌ Not Set",
-        "database_name": "❌ Not Set",
-        "connection_status": "Not Connected",
-        "collections": [],
-    }
+async def test_database():
+    """Check database connectivity and list available collections (readiness)"""
+    global _last_healthy_status
+
+    checked_at, cached = _last_healthy_status
+    now = time.monotonic()
+    if cached is not None and now - checked_at < _TEST_STATUS_TTL:
+        return cached
+
+    status = dict(_TEST_STATUS_TEMPLATE)
 
     try:
         if db is not None:
             status["database"] = "✅ Available"
-            status["database_url"] = "✅ Set" if os.getenv("DATABASE_URL") else "❌ Not Set"
-            status["database_name"] = os.getenv("DATABASE_NAME") or "❌ Not Set"
+            status["database_url"] = "✅ Set" if DATABASE_URL_SET else "❌ Not Set"
+            status["database_name"] = DATABASE_NAME_ENV or "❌ Not Set"
             try:
-                status["collections"] = db.list_collection_names()
+                status["collections"] = await db.list_collection_names()
                 status["database"] = "✅ Connected & Working"
                 status["connection_status"] = "Connected"
+                _last_healthy_status = (now, status)
             except Exception as e:
                 status["database"] = f"⚠️ Connected but error: {str(e)[:100]}"
         else:
@@ -58,57 +144,123 @@ def test_database():
 # -----------------------------
 # Schema discovery (for admin tools)
 # -----------------------------
-class SchemaField(BaseModel):
+class SchemaField(TypedDict):
     name: str
     type: str
 
-class CollectionSchema(BaseModel):
+class CollectionSchema(TypedDict):
     collection: str
     fields: List[SchemaField]
 
-@app.get("/schema", response_model=List[CollectionSchema])
-def get_schema():
-    out: List[CollectionSchema] = []
-    for name, model in SCHEMA_REGISTRY.items():
-        fields = [SchemaField(name=k, type=str(v.annotation)) for k, v in model.model_fields.items()]
-        out.append(CollectionSchema(collection=name.lower(), fields=fields))
-    return out
+
+# SCHEMA_REGISTRY is static, so field listings and the payload are built once at import
+def _model_fields(model) -> List[SchemaField]:
+    if isinstance(model, type) and issubclass(model, msgspec.Struct):
+        return [{"name": f.name, "type": str(f.type)} for f in msgspec.structs.fields(model)]
+    return [{"name": k, "type": str(v.annotation)} for k, v in model.model_fields.items()]
+
+
+_FIELDS_BY_COLLECTION: Dict[str, List[SchemaField]] = {
+    name.lower(): _model_fields(model) for name, model in SCHEMA_REGISTRY.items()
+}
+
+_SCHEMA_PAYLOAD = orjson.dumps([
+    CollectionSchema(collection=name, fields=fields) for name, fields in _FIELDS_BY_COLLECTION.items()
+])
+
+
+@app.get("/schema")
+async def get_schema():
+    return Response(content=_SCHEMA_PAYLOAD, media_type="application/json")
 
 
 # -----------------------------
 # Public content endpoints
 # -----------------------------
-@app.get("/articles")
-def list_articles(
+def _strong_etag(body: bytes) -> str:
+    return '"%s"' % hashlib.blake2b(body, digest_size=8).hexdigest()
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 specifies for GET)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = {t.strip().removeprefix("W/") for t in header.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+# Listing cards don't need the article body; /articles/{slug} still fetches it in full.
+# Keep in sync with schemas.ArticleCard.
+_ARTICLE_LISTING_PROJECTION = {
+    "title": 1, "summary": 1, "slug": 1, "category": 1,
+    "tags": 1, "cover_image": 1, "author": 1, "published_at": 1,
+}
+
+def _text_search_terms(q: str) -> str:
+    """Neutralize $text operators (phrase quotes, leading-hyphen negation) so input matches as plain words"""
+    return " ".join(t.lstrip("-") for t in q.replace('"', " ").split())
+
+
+@app.get("/articles", responses={200: {"model": List[ArticleCard]}})
+async def list_articles(
     q: Optional[str] = None,
     category: Optional[str] = None,
     tag: Optional[str] = None,
     limit: int = Query(20, ge=1, le=100)
 ):
     filt = {}
-    if q:
-        # naive text search across title/summary
-        filt["$or"] = [
-            {"title": {"$regex": q, "$options": "i"}},
-            {"summary": {"$regex": q, "$options": "i"}},
-        ]
     if category:
         filt["category"] = category
     if tag:
-        filt["tags"] = {"$in": [tag]}
-    return get_documents("article", filt, limit)
+        filt["tags"] = tag
+    if not q:
+        return ORJSONResponse(await get_documents("article", filt, limit, projection=_ARTICLE_LISTING_PROJECTION))
 
+    docs = []
+    terms = _text_search_terms(q)
+    if terms:
+        # weighted text index on title/summary (see database.INDEXES)
+        text_filt = {**filt, "$text": {"$search": terms}}
+        try:
+            docs = await get_documents(
+                "article", text_filt, limit,
+                projection={**_ARTICLE_LISTING_PROJECTION, "score": {"$meta": "textScore"}},
+                sort=[("score", {"$meta": "textScore"})],
+            )
+        except OperationFailure:
+            logger.exception("$text search failed; falling back to prefix match")
+    if not docs:
+        # $text only matches whole (stemmed) words, so partial input like
+        # "canna" finds nothing; retry as an anchored prefix match on the
+        # lowercased fields, which can use their indexes
+        prefix = re.compile("^" + re.escape(q.lower()))
+        filt["$or"] = [
+            {"title_lc": prefix},
+            {"summary_lc": prefix},
+        ]
+        docs = await get_documents("article", filt, limit, projection=_ARTICLE_LISTING_PROJECTION)
+    return ORJSONResponse(docs)
 
-@app.get("/articles/{slug}")
-def get_article(slug: str):
-    docs = get_documents("article", {"slug": slug}, limit=1)
+
+@app.get("/articles/{slug}", responses={200: {"model": ArticleOut}})
+async def get_article(slug: str, request: Request):
+    docs = await get_documents("article", {"slug": slug}, limit=1)
     if not docs:
         raise HTTPException(status_code=404, detail="Article not found")
-    return docs[0]
+    article = docs[0]
+    # updated_at is stamped by create_document; published_at covers hand-loaded docs
+    changed_at = article.get("updated_at") or article.get("published_at")
+    if not isinstance(changed_at, datetime):
+        return ORJSONResponse(article)
+    headers = {"ETag": f'W/"{changed_at.timestamp():.6f}"'}
+    if _etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return ORJSONResponse(article, headers=headers)
 
 
-@app.get("/doctors")
-def list_doctors(
+@app.get("/doctors", responses={200: {"model": List[DoctorOut]}})
+async def list_doctors(
     specialty: Optional[str] = None,
     state: Optional[str] = None,
     city: Optional[str] = None,
@@ -117,70 +269,180 @@ def list_doctors(
     price_max: Optional[float] = Query(None, ge=0),
     limit: int = Query(50, ge=1, le=100)
 ):
+    # scalar equality on an array field matches any element, no $in needed
     filt = {}
     if specialty:
-        filt["specialties"] = {"$in": [specialty]}
+        filt["specialties"] = specialty
     if state:
-        filt["states"] = {"$in": [state]}
+        filt["states"] = state
     if city:
-        filt["cities"] = {"$in": [city]}
+        filt["cities"] = city
     if pathology:
-        filt["pathologies"] = {"$in": [pathology]}
+        filt["pathologies"] = pathology
     if consultation_type:
-        filt["consultation_types"] = {"$in": [consultation_type]}
+        filt["consultation_types"] = consultation_type
     if price_max is not None:
         filt["price_from"] = {"$lte": price_max}
 
-    return get_documents("doctor", filt, limit)
+    return ORJSONResponse(await get_documents("doctor", filt, limit))
 
 
 # -----------------------------
 # Lead capture endpoints
 # -----------------------------
-@app.post("/appointment")
-def create_appointment(req: AppointmentRequest):
-    doc_id = create_document("appointmentrequest", req)
+_MSGSPEC_MISSING_FIELD = re.compile(r"Object missing required field `(.+)`")
+_MSGSPEC_PATH_PART = re.compile(r"\.([^.\[]+)|\[(\d+)\]")
+
+
+def _msgspec_errors(e: msgspec.MsgspecError) -> List[dict]:
+    """Translate a msgspec error into FastAPI's validation error list ({"type", "loc", "msg"})"""
+    if not isinstance(e, msgspec.ValidationError):  # malformed JSON (ValidationError subclasses DecodeError)
+        return [{"type": "json_invalid", "loc": ("body",), "msg": "JSON decode error", "ctx": {"error": str(e)}}]
+    msg, _, path = str(e).partition(" - at `")
+    loc: List[Any] = ["body"]
+    for key, index in _MSGSPEC_PATH_PART.findall(path.rstrip("`")):
+        loc.append(key if key else int(index))
+    missing = _MSGSPEC_MISSING_FIELD.fullmatch(msg)
+    if missing:
+        return [{"type": "missing", "loc": (*loc, missing.group(1)), "msg": "Field required"}]
+    return [{"type": "value_error", "loc": tuple(loc), "msg": msg}]
+
+
+def _msgspec_body(struct_type):
+    """Dependency decoding + validating the raw request body straight into a msgspec struct"""
+    decoder = msgspec.json.Decoder(struct_type, dec_hook=decode_hook)
+
+    async def parse(request: Request):
+        body = await request.body()
+        try:
+            return decoder.decode(body)
+        except (msgspec.ValidationError, msgspec.DecodeError) as e:
+            raise RequestValidationError(_msgspec_errors(e), body=body)
+
+    return parse
+
+
+def _msgspec_openapi(struct_type) -> dict:
+    """openapi_extra documenting a msgspec request body (FastAPI can't introspect Structs)"""
+    _, components = msgspec.json.schema_components((struct_type,), schema_hook=schema_hook)
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": components[struct_type.__name__]}},
+        }
+    }
+
+
+async def _write_document(collection_name: str, data: msgspec.Struct, doc_id: str):
+    """Background insert; the client already has its id, so failures are only logged"""
+    try:
+        await create_document(collection_name, data, _id=doc_id)
+    except Exception:
+        logger.exception("Failed to write %s %s", collection_name, doc_id)
+
+
+def _enqueue_document(bg: BackgroundTasks, collection_name: str, data: msgspec.Struct) -> str:
+    if db is None:
+        raise HTTPException(status_code=503, detail="Database not available")
+    doc_id = str(ObjectId())
+    bg.add_task(_write_document, collection_name, data, doc_id)
+    return doc_id
+
+
+@app.post("/appointment", openapi_extra=_msgspec_openapi(AppointmentRequest))
+async def create_appointment(bg: BackgroundTasks, req: AppointmentRequest = Depends(_msgspec_body(AppointmentRequest))):
+    doc_id = _enqueue_document(bg, "appointmentrequest", req)
     return {"status": "ok", "id": doc_id}
 
 
-@app.post("/newsletter")
-def subscribe_newsletter(sub: NewsletterSubscriber):
-    doc_id = create_document("newslettersubscriber", sub)
+@app.post("/newsletter", openapi_extra=_msgspec_openapi(NewsletterSubscriber))
+async def subscribe_newsletter(bg: BackgroundTasks, sub: NewsletterSubscriber = Depends(_msgspec_body(NewsletterSubscriber))):
+    doc_id = _enqueue_document(bg, "newslettersubscriber", sub)
     return {"status": "ok", "id": doc_id}
 
 
 # -----------------------------
 # SEO endpoints
 # -----------------------------
-@app.get("/sitemap.xml", response_class=PlainTextResponse)
-def sitemap():
-    base_frontend = os.getenv("FRONTEND_URL", "https://example.com")
-    static_paths = ["/", "/articles", "/about", "/press", "/contact", "/privacy", "/terms", "/lgpd"]
-    urls = [f"  <url><loc>{base_frontend}{p}</loc></url>" for p in static_paths]
-    try:
-        articles = get_documents("article", {}, limit=500)
-        for a in articles:
+_SITEMAP_TTL = 300  # seconds
+_SITEMAP_RETRY = 30  # seconds before retrying Mongo after a failed regeneration
+_STATIC_PATHS = [b"/", b"/articles", b"/about", b"/press", b"/contact", b"/privacy", b"/terms", b"/lgpd"]
+
+# Last rendered sitemap; served while fresh, and as a stale fallback when Mongo is down.
+# max_age is what clients/CDNs may cache it for: the full TTL only for a fresh render.
+_sitemap_cache = {"stale_at": 0.0, "body": None, "etag": None, "max_age": 0}
+
+# Only one coroutine regenerates at a time; the rest serve the current body meanwhile
+_sitemap_lock = asyncio.Lock()
+
+
+_SITEMAP_PREFIX = (
+    b'<?xml version="1.0" encoding="UTF-8"?>\n'
+    b'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+)
+_SITEMAP_SUFFIX = b"</urlset>\n"
+
+
+async def _render_sitemap(include_articles: bool = True) -> bytes:
+    buf = bytearray(_SITEMAP_PREFIX)
+    for p in _STATIC_PATHS:
+        buf += b"  <url><loc>%s%s</loc></url>\n" % (FRONTEND_URL, p)
+    if include_articles:
+        # only the slug is needed; skip shipping article bodies from Mongo
+        async for a in iter_documents(
+            "article", {}, limit=500, projection={"slug": 1, "_id": 0}, batch_size=500
+        ):
             slug = a.get("slug")
             if slug:
-                urls.append(f"  <url><loc>{base_frontend}/articles/{slug}</loc></url>")
-    except Exception:
-        pass
-    xml = "\n".join([
-        "<?xml version=\"1.0\" encoding=\"UTF-8\"?>",
-        "<urlset xmlns=\"http://www.sitemaps.org/schemas/sitemap/0.9\">",
-        *urls,
-        "</urlset>",
-    ])
-    return xml
+                buf += b"  <url><loc>%s/articles/%s</loc></url>\n" % (FRONTEND_URL, slug.encode())
+    buf += _SITEMAP_SUFFIX
+    return bytes(buf)
+
+
+async def _refresh_sitemap():
+    async with _sitemap_lock:
+        now = time.monotonic()
+        if _sitemap_cache["body"] is not None and now < _sitemap_cache["stale_at"]:
+            return  # another request regenerated it while we waited
+        try:
+            body = await _render_sitemap()
+        except Exception:
+            logger.exception("Sitemap regeneration failed; serving fallback")
+            # keep the last full sitemap if there is one, else publish static pages only;
+            # either way don't hit Mongo again until the retry backoff has passed
+            body = _sitemap_cache["body"]
+            if body is None:
+                body = await _render_sitemap(include_articles=False)
+            _sitemap_cache.update(
+                stale_at=now + _SITEMAP_RETRY, body=body, etag=_strong_etag(body), max_age=_SITEMAP_RETRY
+            )
+            return
+        _sitemap_cache.update(stale_at=now + _SITEMAP_TTL, body=body, etag=_strong_etag(body), max_age=_SITEMAP_TTL)
+
+
+@app.get("/sitemap.xml", response_class=PlainTextResponse)
+async def sitemap(request: Request):
+    stale = time.monotonic() >= _sitemap_cache["stale_at"]
+    if _sitemap_cache["body"] is None or (stale and not _sitemap_lock.locked()):
+        await _refresh_sitemap()
+    body, etag = _sitemap_cache["body"], _sitemap_cache["etag"]
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={_sitemap_cache['max_age']}"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return PlainTextResponse(body, media_type="application/xml", headers=headers)
+
+
+_ROBOTS = b"User-agent: *\nAllow: /\nSitemap: %s/sitemap.xml\n" % FRONTEND_URL
 
 
 @app.get("/robots.txt", response_class=PlainTextResponse)
-def robots():
-    base_frontend = os.getenv("FRONTEND_URL", "https://example.com")
-    return f"User-agent: *\nAllow: /\nSitemap: {base_frontend}/sitemap.xml\n"
+async def robots():
+    return PlainTextResponse(_ROBOTS)
 
 
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    workers = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+    # import string (not the app object) is required for uvicorn to spawn workers
+    uvicorn.run("main:app", host="0.0.0.0", port=port, loop="uvloop", http="httptools", workers=workers)
@@ -1,10 +1,13 @@
 """
 Database Schemas for Medicinal Cannabis Portal
 
-Each Pydantic model maps to a MongoDB collection (lowercased class name).
+Each model (Pydantic, or msgspec.Struct for request bodies) maps to a
+MongoDB collection (lowercased class name).
 These models are used for validating input and documenting the data layer.
 """
 
+import msgspec
+from email_validator import EmailNotValidError, validate_email
 from pydantic import BaseModel, Field, EmailStr, HttpUrl
 from typing import Optional, List
 from datetime import datetime
@@ -52,30 +55,116 @@ class Article(BaseModel):
     related_slugs: List[str] = Field(default_factory=list)
 
 
-class AppointmentRequest(BaseModel):
+# -----------------------------
+# Response models (documentation only)
+# -----------------------------
+# Listing endpoints return Mongo documents as-is; these mirror the collection
+# models with plain str in place of EmailStr/HttpUrl so that nothing on the
+# response path pays for email/URL validation.
+
+class DoctorOut(BaseModel):
+    """Doctor as returned by /doctors"""
+    id: str = Field(..., alias="_id", description="ObjectId as string")
+    name: str
+    crm: Optional[str] = None
+    photo_url: Optional[str] = None
+    specialties: List[str] = Field(default_factory=list)
+    pathologies: List[str] = Field(default_factory=list)
+    consultation_types: List[str] = Field(default_factory=list)
+    price_from: Optional[float] = None
+    states: List[str] = Field(default_factory=list)
+    cities: List[str] = Field(default_factory=list)
+    clinic_name: Optional[str] = None
+    languages: List[str] = Field(default_factory=list)
+    education: Optional[str] = None
+    bio: Optional[str] = None
+    whatsapp: Optional[str] = None
+    email: Optional[str] = None
+
+
+class ArticleCard(BaseModel):
+    """Article listing entry as returned by /articles (no body)"""
+    id: str = Field(..., alias="_id", description="ObjectId as string")
+    title: str
+    slug: str
+    summary: Optional[str] = None
+    category: Optional[str] = None
+    tags: List[str] = Field(default_factory=list)
+    cover_image: Optional[str] = None
+    author: Optional[str] = None
+    published_at: Optional[datetime] = None
+    score: Optional[float] = Field(None, description="Text-search relevance; only present for q searches")
+
+
+class ArticleOut(BaseModel):
+    """Article as returned by /articles/{slug}"""
+    id: str = Field(..., alias="_id", description="ObjectId as string")
+    title: str
+    slug: str
+    summary: Optional[str] = None
+    content: Optional[str] = None
+    category: Optional[str] = None
+    tags: List[str] = Field(default_factory=list)
+    cover_image: Optional[str] = None
+    author: Optional[str] = None
+    published_at: Optional[datetime] = None
+    related_slugs: List[str] = Field(default_factory=list)
+
+
+# -----------------------------
+# Lead capture models (untrusted user input, strictly validated)
+# -----------------------------
+
+# Decoded with msgspec rather than Pydantic: these sit on the public POST
+# paths, and msgspec validates the same constraints at a fraction of the cost.
+
+class Email(str):
+    """Email address; validated and normalized by email-validator in decode_hook, as EmailStr is"""
+
+
+def decode_hook(type_, obj):
+    """msgspec dec_hook for the custom types above (errors are reported at the field's path)"""
+    if type_ is Email:
+        if not isinstance(obj, str):
+            raise TypeError(f"Expected `str`, got `{type(obj).__name__}`")
+        try:
+            return Email(validate_email(obj, check_deliverability=False).normalized)
+        except EmailNotValidError as e:
+            raise ValueError(f"value is not a valid email address: {e}")
+    raise NotImplementedError
+
+
+def schema_hook(type_):
+    """msgspec JSON-schema hook for the custom types above"""
+    if type_ is Email:
+        return {"type": "string", "format": "email"}
+    raise NotImplementedError
+
+
+class AppointmentRequest(msgspec.Struct):
     """
     Pre-scheduling requests from patients
     Collection: "appointmentrequest"
     """
     patient_name: str
-    email: EmailStr
+    email: Email
     phone: str
     pathology: str
-    consultation_type: Optional[str] = Field(None, description="telemedicine | in-person")
-    preferred_dates: List[str] = Field(default_factory=list)
+    consultation_type: Optional[str] = None  # telemedicine | in-person
+    preferred_dates: List[str] = msgspec.field(default_factory=list)
     state: Optional[str] = None
     city: Optional[str] = None
-    doctor_id: Optional[str] = Field(None, description="Target doctor ObjectId as string")
+    doctor_id: Optional[str] = None  # Target doctor ObjectId as string
     notes: Optional[str] = None
 
 
-class NewsletterSubscriber(BaseModel):
+class NewsletterSubscriber(msgspec.Struct):
     """
     Newsletter subscribers and interest segmentation
     Collection: "newslettersubscriber"
     """
-    email: EmailStr
-    interests: List[str] = Field(default_factory=list, description="e.g., Treatments, Research, Doctors, Events")
+    email: Email
+    interests: List[str] = msgspec.field(default_factory=list)  # e.g., Treatments, Research, Doctors, Events
 
 
 # Convenience export for /schema endpoint
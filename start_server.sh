@@ -15,5 +15,13 @@ mkdir -p logs
 echo "Installing dependencies..."
 pip install -r requirements.txt
 echo "Starting FastAPI server..."
-nohup uvicorn main:app --host 0.0.0.0 --port 8000 --reload > logs/server.log 2>&1 
+PORT=${PORT:-8000}
+if [ "$RELOAD" = "1" ]; then
+  # development: single auto-reloading process
+  nohup uvicorn main:app --host 0.0.0.0 --port $PORT --reload > logs/server.log 2>&1 
+else
+  # production: uvloop + httptools with one worker per core (override via WEB_CONCURRENCY)
+  WORKERS=${WEB_CONCURRENCY:-$(nproc)}
+  nohup uvicorn main:app --host 0.0.0.0 --port $PORT --loop uvloop --http httptools --workers $WORKERS > logs/server.log 2>&1 
+fi
 echo "Server started in background"